@@ -1,17 +1,49 @@
 import os
-import json
-import glob
+import asyncio
+import orjson
 import re
+import html
+import hashlib
+import mmap
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import csv
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from openai import AzureOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 # Load environment variables
 load_dotenv()
 
+# Non-content HTML blocks dropped before reports are sent to the LLM
+_HTML_NOISE = re.compile(r'<(script|style|head|svg)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_HTML_TAG = re.compile(r'<[^>]+>')
+_WHITESPACE = re.compile(r'\s+')
+
+# Prompt prefix: kept constant (no counts or timestamps) for server-side prompt caching
+SYSTEM_PROMPT = "You are an expert QA engineer analyzing test failures and commit history."
+
+INSTRUCTIONS = """You are a QA test analysis expert. Analyze the commit history and HTML test execution reports below to identify root causes of test failures.
+
+Please analyze the test reports and provide:
+1. Root cause analysis of any test failures
+2. Which commits might have introduced the issues
+3. Specific file/line references from error stack traces
+4. Exact error messages and their meanings
+5. Actionable recommendations to fix the issues
+6. Patterns or trends you observe
+
+Be concise, specific, and actionable."""
+
+
+def _log_retry(retry_state):
+    """Report a failed Azure OpenAI attempt before backing off"""
+    print(f"⚠ Azure OpenAI attempt {retry_state.attempt_number} failed "
+          f"after {retry_state.seconds_since_start:.1f}s: {retry_state.outcome.exception()} — retrying")
+
 
 class LLMTestAnalyzer:
     """Analyzes test reports and commit history using Azure OpenAI"""
@@ -19,6 +51,8 @@ class LLMTestAnalyzer:
     def __init__(self):
         self.commits_data = []
         self.test_reports = []
+        self.cache_dir = Path(".llm_cache")
+        self.token_usage = None
         self.llm = self._initialize_llm()
         
     def _initialize_llm(self):
@@ -31,34 +65,96 @@ class LLMTestAnalyzer:
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
             api_version=os.getenv("AZURE_OPENAI_VERSION"),
             api_key=os.getenv("OPENAI_API_KEY"),
-            azure_deployment="gpt-4.1-mini"
+            azure_deployment="gpt-4.1-mini",
+            max_retries=0  # retries are handled by _invoke_with_retry
         )
         return llm
     
+    @retry(
+        retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+        wait=wait_random_exponential(multiplier=1, max=30),
+        stop=stop_after_attempt(3),
+        before_sleep=_log_retry,
+        reraise=True
+    )
+    async def _invoke_with_retry(self, messages):
+        """Call Azure OpenAI, retrying transient rate-limit/connection/server errors"""
+        return await self.llm.ainvoke(messages)
+    
+    async def _cached_invoke(self, messages):
+        """Invoke the LLM, reusing the stored response for an identical request"""
+        key_hash = hashlib.blake2b(digest_size=32)
+        for part in (self.llm.deployment_name, str(self.llm.temperature), str(self.llm.max_tokens)):
+            key_hash.update(part.encode('utf-8') + b'\x00')
+        for message in messages:
+            key_hash.update(message.content.encode('utf-8') + b'\x00')
+        key = key_hash.hexdigest()
+        cache_file = self.cache_dir / f"{key}.txt"
+        
+        if cache_file.exists():
+            print("✓ Using cached analysis")
+            self.token_usage = None
+            return cache_file.read_text(encoding='utf-8')
+        
+        response = await self._invoke_with_retry(messages)
+        analysis = response.content
+        
+        # cached_tokens shows whether Azure reused the static prompt prefix
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self.token_usage = {
+            'prompt_tokens': usage.get('input_tokens'),
+            'completion_tokens': usage.get('output_tokens'),
+            'cached_tokens': (usage.get('input_token_details') or {}).get('cache_read')
+        }
+        
+        # Write atomically so an interrupted run never leaves a partial entry
+        self.cache_dir.mkdir(exist_ok=True)
+        tmp_file = cache_file.with_suffix(".tmp")
+        tmp_file.write_text(analysis, encoding='utf-8')
+        os.replace(tmp_file, cache_file)
+        return analysis
+    
     def load_commit_data(self, data_folder):
         """Load commit history from JSON file"""
         commits_file = Path(data_folder) / "commits_detailed.json"
         
         if commits_file.exists():
-            with open(commits_file, 'r', encoding='utf-8') as f:
-                self.commits_data = json.load(f)
+            with open(commits_file, 'rb') as f:
+                self.commits_data = orjson.loads(f.read())
             print(f"✓ Commits Loaded: {len(self.commits_data)}")
         else:
             print(f"✗ Commits file not found: {commits_file}")
     
+    @staticmethod
+    def _distill_html(content):
+        """Reduce an HTML report to its visible text (test names, errors, stack traces)"""
+        text = _HTML_NOISE.sub(' ', content)
+        text = _HTML_TAG.sub(' ', text)
+        return _WHITESPACE.sub(' ', html.unescape(text)).strip()
+    
     def load_raw_html_report(self, report_path):
-        """Load raw HTML report without parsing"""
-        with open(report_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        """Hash a raw HTML report and compute its distilled text"""
+        with open(report_path, 'rb') as f:
+            # mmap cannot map empty files
+            if os.fstat(f.fileno()).st_size:
+                # Unmapped before returning, so the file is not held open (and locked on Windows)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    size = len(mm)
+                    sha1 = hashlib.sha1(mm).hexdigest()
+                    content = str(mm, 'utf-8', 'replace')
+            else:
+                size = 0
+                sha1 = hashlib.sha1(b'').hexdigest()
+                content = ''
         
-        report_data = {
+        return {
             'path': str(report_path),
             'name': report_path.name,
-            'size_kb': round(len(content) / 1024, 2),
-            'content': content
+            'size_kb': round(size / 1024, 2),
+            'sha1': sha1,
+            # The decoded HTML is only held long enough to distill it
+            'distilled': self._distill_html(content)
         }
-        
-        return report_data
     
     def load_test_reports(self, reports_folder):
         """Load all raw HTML test reports"""
@@ -68,11 +164,14 @@ class LLMTestAnalyzer:
             print(f"✗ html-reports folder not found: {html_reports_path}")
             return
         
-        report_files = glob.glob(str(html_reports_path / "*.html"))
+        report_files = list(html_reports_path.glob("*.html"))
         
-        for report_file in report_files:
-            report_data = self.load_raw_html_report(Path(report_file))
-            self.test_reports.append(report_data)
+        # Reports are independent, so overlap the file reads
+        if report_files:
+            with ThreadPoolExecutor(max_workers=min(16, len(report_files))) as executor:
+                self.test_reports.extend(
+                    executor.map(self.load_raw_html_report, report_files)
+                )
         
         print(f"✓ Test Reports: {len(self.test_reports)}")
     
@@ -85,18 +184,19 @@ class LLMTestAnalyzer:
                 'hash': commit.get('hash', '')[:8],
                 'author': commit.get('author', {}).get('name', ''),
                 'date': commit.get('date', ''),
-                'message': commit.get('message', ''),
+                # Subject + first paragraph only; the full message stays in commits_detailed.json
+                'message': commit.get('message', '').split('\n\n', 1)[0][:240],
                 'files_changed': len(commit.get('files_changed', []))
             }
             commit_summary.append(commit_info)
         
-        # Prepare raw HTML reports
+        # Prepare distilled report text (save_analysis references the raw HTML by path and sha1)
         test_reports = []
         for report in self.test_reports:
             test_reports.append({
                 'name': report['name'],
                 'size_kb': report['size_kb'],
-                'html_content': report['content']
+                'text_content': report['distilled']
             })
         
         return {
@@ -104,51 +204,130 @@ class LLMTestAnalyzer:
             'test_reports': test_reports
         }
     
-    def analyze_with_llm(self):
-        """Send data to Azure OpenAI for analysis"""
+    def build_messages(self):
+        """Build the system and user messages for the loaded data"""
         context = self.prepare_analysis_context()
         
-        # Create prompt with raw HTML reports
-        reports_text = ""
+        # Create prompt with distilled reports (joined once, not concatenated per report)
+        parts = []
         for idx, report in enumerate(context['test_reports'], 1):
-            reports_text += f"\n\n--- TEST REPORT {idx}: {report['name']} ({report['size_kb']} KB) ---\n"
-            reports_text += report['html_content']
+            parts.append(f"\n\n--- TEST REPORT {idx}: {report['name']} ({report['size_kb']} KB) ---\n")
+            parts.append(report['text_content'])
+        reports_text = "".join(parts)
         
-        prompt = f"""You are a QA test analysis expert. Analyze the following commit history and HTML test execution reports to identify root causes of test failures.
-
-COMMIT HISTORY (Last 30 commits):
-{json.dumps(context['commits'], indent=2)}
-
-TEST EXECUTION REPORTS (Raw HTML):
-{reports_text}
-
-Please analyze the HTML reports and provide:
-1. Root cause analysis of any test failures
-2. Which commits might have introduced the issues
-3. Specific file/line references from error stack traces
-4. Exact error messages and their meanings
-5. Actionable recommendations to fix the issues
-6. Patterns or trends you observe
-
-Be concise, specific, and actionable."""
-
-        messages = [
-            SystemMessage(content="You are an expert QA engineer analyzing test failures and commit history."),
+        # Compact JSON keeps the commit block small in bytes and tokens
+        commits_json = orjson.dumps(context['commits']).decode('utf-8')
+        
+        # Static instructions first so Azure can reuse the cached prompt prefix
+        prompt = "".join([
+            INSTRUCTIONS,
+            "\n\nCOMMIT HISTORY:\n", commits_json,
+            "\n\nTEST EXECUTION REPORTS (text extracted from HTML):", reports_text
+        ])
+        
+        return [
+            SystemMessage(content=SYSTEM_PROMPT),
             HumanMessage(content=prompt)
         ]
+    
+    async def analyze_with_llm(self):
+        """Send data to Azure OpenAI for analysis"""
+        messages = self.build_messages()
         
         print("\n" + "="*80)
         print("ANALYZING WITH AZURE OPENAI...")
         print("="*80 + "\n")
         
         try:
-            response = self.llm.invoke(messages)
-            analysis = response.content
+            analysis = await self._cached_invoke(messages)
             return analysis
         except Exception as e:
             print(f"✗ Error calling Azure OpenAI: {e}")
             return None
     
+    def _batch_client(self):
+        """Create a synchronous Azure OpenAI client for the Batch API"""
+        return AzureOpenAI(
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_version=os.getenv("AZURE_OPENAI_VERSION"),
+            api_key=os.getenv("OPENAI_API_KEY")
+        )
+    
+    def submit_batch(self, jobs):
+        """
+        Submit analyses to the Azure OpenAI Batch API (24h completion window)
+        
+        Each job is a dict with a unique 'custom_id' and the 'messages'
+        returned by build_messages(). Returns the batch id for poll_batch().
+        """
+        role_map = {'system': 'system', 'human': 'user', 'ai': 'assistant'}
+        lines = []
+        for job in jobs:
+            lines.append(orjson.dumps({
+                'custom_id': job['custom_id'],
+                'method': 'POST',
+                'url': '/chat/completions',
+                'body': {
+                    'model': self.llm.deployment_name,
+                    'temperature': self.llm.temperature,
+                    'max_tokens': self.llm.max_tokens,
+                    'messages': [
+                        {'role': role_map[m.type], 'content': m.content} for m in job['messages']
+                    ]
+                }
+            }))
+        
+        client = self._batch_client()
+        batch_file = client.files.create(
+            file=("batch_jobs.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h"
+        )
+        print(f"✓ Batch submitted: {batch.id} ({len(jobs)} jobs)")
+        return batch.id
+    
+    def poll_batch(self, batch_id):
+        """
+        Fetch the results of a submitted batch
+        
+        Returns None while the batch is still running and an empty dict if
+        the batch itself failed, expired or was cancelled. Otherwise returns
+        a dict mapping each job's custom_id to its analysis (None if it failed).
+        """
+        client = self._batch_client()
+        batch = client.batches.retrieve(batch_id)
+        
+        if batch.status in ("failed", "expired", "cancelled"):
+            print(f"✗ Batch {batch_id} ended with status: {batch.status}")
+            return {}
+        if batch.status != "completed":
+            print(f"… Batch {batch_id} status: {batch.status}")
+            return None
+        
+        # Successful requests go to the output file, failed ones to the error file
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            output = client.files.content(file_id).read()
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                response = record.get('response') or {}
+                if response.get('status_code') == 200:
+                    results[record['custom_id']] = response['body']['choices'][0]['message']['content']
+                else:
+                    results[record['custom_id']] = None
+        
+        failed = sum(1 for analysis in results.values() if analysis is None)
+        print(f"✓ Batch {batch_id} completed: {len(results)} results ({failed} failed)")
+        return results
+    
     def display_summary(self):
         """Display summary statistics"""
         print("\n" + "="*80)
@@ -172,14 +351,24 @@ Be concise, specific, and actionable."""
             'commits_analyzed': len(self.commits_data),
             'reports_analyzed': len(self.test_reports),
             'llm_analysis': analysis_result,
+            'token_usage': self.token_usage,
+            # References only; the commits and reports stay in pulled_data and html-reports
             'raw_data': {
-                'commits': self.commits_data[:30],
-                'test_reports': self.test_reports
+                'commit_shas': [c.get('sha', c.get('hash', '')) for c in self.commits_data[:30]],
+                'test_reports': [
+                    {
+                        'path': r['path'],
+                        'name': r['name'],
+                        'size_kb': r['size_kb'],
+                        'sha1': r['sha1']
+                    }
+                    for r in self.test_reports
+                ]
             }
         }
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2)
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
         
         print(f"\n✓ Analysis saved to: {output_file}")
     
@@ -197,7 +386,7 @@ Be concise, specific, and actionable."""
         self.display_summary()
         
         # Run LLM analysis
-        analysis_result = self.analyze_with_llm()
+        analysis_result = asyncio.run(self.analyze_with_llm())
         
         if analysis_result:
             print("\n" + "="*80)
@@ -215,6 +404,17 @@ Be concise, specific, and actionable."""
             print("\n✗ Analysis failed. Please check your Azure OpenAI configuration.")
 
 
+async def run_many(analyzers, max_concurrency=10):
+    """Run several loaded analyzers concurrently, capped to Azure's concurrency limit"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def analyze(analyzer):
+        async with semaphore:
+            return await analyzer.analyze_with_llm()
+    
+    return await asyncio.gather(*(analyze(a) for a in analyzers))
+
+
 def main():
     """Main entry point"""
     # Define paths
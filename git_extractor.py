@@ -4,18 +4,26 @@ Extracts comprehensive information from GitHub repositories using GitPython
 """
 
 import os
-import json
+import orjson
 import csv
 import shutil
+import subprocess
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import git
 from git import Repo
 import hashlib
 
 
+_FORMATTER = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+_CONSOLE_HANDLER = logging.StreamHandler()
+_CONSOLE_HANDLER.setLevel(logging.INFO)
+_CONSOLE_HANDLER.setFormatter(_FORMATTER)
+
+
 class GitExtractor:
     """
     Production-grade Git repository data extractor
@@ -28,6 +36,24 @@ class GitExtractor:
     - Repository metadata
     """
     
+    # `git log` header: record/unit separators delimit each commit, NUL separates fields
+    _LOG_FORMAT = '%x1e%H%x00%an%x00%ae%x00%cn%x00%ce%x00%cI%x00%P%x00%B%x1f'
+    
+    # Stored diff bodies are cut at this many bytes
+    _MAX_DIFF_BYTES = 10000
+    
+    # Extended patch header lines that carry no data we store
+    _LOG_FILE_HEADERS = (
+        b'index ', b'--- ', b'+++ ', b'old mode', b'new mode',
+        b'similarity index', b'dissimilarity index', b'copy from', b'copy to'
+    )
+    
+    # Escapes git uses when C-quoting paths containing `"`, `\`, tabs, newlines...
+    _PATH_ESCAPES = {
+        ord('a'): 7, ord('b'): 8, ord('t'): 9, ord('n'): 10, ord('v'): 11,
+        ord('f'): 12, ord('r'): 13, ord('"'): 34, ord('\\'): 92
+    }
+    
     def __init__(
         self,
         repo_url: str,
@@ -56,7 +82,10 @@ class GitExtractor:
         
         # Setup paths
         self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.session_id = hashlib.md5(f"{repo_url}{self.timestamp}".encode()).hexdigest()[:8]
+        session_hash = hashlib.blake2b(digest_size=4)
+        session_hash.update(repo_url.encode())
+        session_hash.update(self.timestamp.encode())
+        self.session_id = session_hash.hexdigest()
         
         # Create base output directory if it doesn't exist
         base_output = Path(output_dir)
@@ -86,24 +115,24 @@ class GitExtractor:
     
     def _setup_logger(self) -> logging.Logger:
         """Setup logger"""
-        logger = logging.Logger(f"GitExtractor-{self.repo_name}")
+        logger = logging.getLogger(f"GitExtractor.{self.repo_name}")
         logger.setLevel(logging.INFO)
+        logger.propagate = False
+        
+        # File handler: replace any previous run's so each run logs to its own folder
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.FileHandler):
+                logger.removeHandler(handler)
+                handler.close()
         
-        # File handler
         fh = logging.FileHandler(self.output_dir / "extraction.log", encoding='utf-8')
         fh.setLevel(logging.DEBUG)
-        
-        # Console handler
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        
-        # Formatter
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        fh.setFormatter(formatter)
-        ch.setFormatter(formatter)
-        
+        fh.setFormatter(_FORMATTER)
         logger.addHandler(fh)
-        logger.addHandler(ch)
+        
+        # Console handler is shared by all extractors
+        if _CONSOLE_HANDLER not in logger.handlers:
+            logger.addHandler(_CONSOLE_HANDLER)
         
         return logger
     
@@ -112,12 +141,21 @@ class GitExtractor:
         name = url.rstrip('/').split('/')[-1].replace('.git', '')
         return "".join(c for c in name if c.isalnum() or c in ('-', '_')) or 'repo'
     
+    @staticmethod
+    def _subject(message: str, max_length: Optional[int] = 100) -> str:
+        """First line of a commit message, without splitting the whole message"""
+        return message.strip().partition('\n')[0][:max_length]
+    
     def _save_json(self, data: Any, filename: str) -> bool:
         """Save data as JSON"""
         try:
             filepath = self.output_dir / filename
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(
+                    data,
+                    default=str,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                ))
             
             size = filepath.stat().st_size
             self.logger.info(f"✓ Saved {filename} ({size:,} bytes)")
@@ -134,9 +172,10 @@ class GitExtractor:
         try:
             filepath = self.output_dir / filename
             with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=data[0].keys())
-                writer.writeheader()
-                writer.writerows(data)
+                headers = list(data[0].keys())
+                writer = csv.writer(f)
+                writer.writerow(headers)
+                writer.writerows([row[h] for h in headers] for row in data)
             
             self.logger.info(f"✓ Saved {filename} ({len(data)} rows)")
             return True
@@ -152,7 +191,10 @@ class GitExtractor:
             if self.clone_dir.exists():
                 shutil.rmtree(self.clone_dir)
             
-            clone_kwargs = {}
+            # No working tree is written since only history is read. Blobs are
+            # not filtered out: git log -p diffs them all, and a partial clone
+            # would fetch them lazily with roughly one round trip per commit
+            clone_kwargs = {'no_checkout': True}
             # Note: We need full history to extract commits with diffs
             # Shallow clone only gets latest snapshot without history
             if self.shallow_clone and self.max_commits:
@@ -169,6 +211,11 @@ class GitExtractor:
             self.stats['errors'].append(f"Clone failed: {str(e)}")
             return False
     
+    def _count_refs(self, prefix: str) -> int:
+        """Count refs under a prefix without building ref objects"""
+        output = self.repo.git.for_each_ref('--format=%(refname)', prefix)
+        return len(output.splitlines())
+    
     def extract_repository_info(self) -> Dict:
         """Extract basic repository information"""
         self.logger.info("Extracting repository info...")
@@ -181,9 +228,9 @@ class GitExtractor:
                 'extracted_at': datetime.now().isoformat(),
                 'session_id': self.session_id,
                 'remotes': [{'name': r.name, 'url': r.url} for r in self.repo.remotes],
-                'total_commits': sum(1 for _ in self.repo.iter_commits()),
-                'total_branches': len(list(self.repo.branches)),
-                'total_tags': len(list(self.repo.tags))
+                'total_commits': int(self.repo.git.rev_list('--count', 'HEAD')),
+                'total_branches': self._count_refs('refs/heads/'),
+                'total_tags': self._count_refs('refs/tags/')
             }
             
             # Get HEAD info
@@ -205,6 +252,150 @@ class GitExtractor:
             self.logger.error(f"Failed to extract repo info: {e}")
             return {}
     
+    def _iter_log_commits(self):
+        """
+        Stream commits from a single `git log -p` process
+        
+        Yields one dict per commit with its metadata and per-file patches.
+        Merge commits are diffed against their first parent; root commits
+        report their files but no parents.
+        """
+        cmd = [
+            'git', '-C', str(self.clone_dir), '-c', 'core.quotepath=false',
+            'log', '-M', '-p', '--diff-merges=first-parent', '--full-index', '--no-color',
+            f'--format={self._LOG_FORMAT}'
+        ]
+        if self.max_commits:
+            cmd.append(f'-n{self.max_commits}')
+        
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        commit = None
+        header = None
+        file = None
+        
+        try:
+            for line in proc.stdout:
+                # Commit header (may span lines when the message has a body)
+                if header is not None or line.startswith(b'\x1e'):
+                    header = (header or b'') + line
+                    if b'\x1f' not in line:
+                        continue
+                    if commit is not None:
+                        yield commit
+                    commit = self._parse_log_header(header)
+                    header = None
+                    file = None
+                    continue
+                
+                if commit is None:
+                    continue
+                
+                if line.startswith(b'diff --git '):
+                    file = self._new_log_file(line)
+                    commit['files'].append(file)
+                    continue
+                
+                if file is None:
+                    continue
+                
+                # Extended header lines precede the patch body
+                if not file['body']:
+                    if line.startswith(b'new file mode'):
+                        file['new_file'] = True
+                        continue
+                    if line.startswith(b'deleted file mode'):
+                        file['deleted'] = True
+                        continue
+                    if line.startswith(b'rename from '):
+                        file['old_path'] = self._log_path(line[12:].rstrip(b'\n'))
+                        continue
+                    if line.startswith(b'rename to '):
+                        file['new_path'] = self._log_path(line[10:].rstrip(b'\n'))
+                        continue
+                    if line.startswith(self._LOG_FILE_HEADERS):
+                        continue
+                
+                # Keep only the bytes we will store, but count every line
+                if file['size'] < self._MAX_DIFF_BYTES:
+                    file['body'].append(line)
+                file['size'] += len(line)
+                if line.startswith(b'+'):
+                    file['insertions'] += 1
+                elif line.startswith(b'-'):
+                    file['deletions'] += 1
+            
+            if commit is not None:
+                yield commit
+        finally:
+            proc.stdout.close()
+            stderr = proc.stderr.read().decode('utf-8', errors='replace').strip()
+            proc.stderr.close()
+            if proc.wait() != 0 and stderr:
+                self.logger.warning(f"git log: {stderr}")
+    
+    @staticmethod
+    def _parse_log_header(header: bytes) -> Dict:
+        """Parse the NUL-separated `git log --format` header of one commit"""
+        fields = header.strip()[1:-1].decode('utf-8', errors='replace').split('\x00')
+        sha, author_name, author_email, committer_name, committer_email, date, parents, message = fields
+        return {
+            'sha': sha,
+            'author': {'name': author_name, 'email': author_email},
+            'committer': {'name': committer_name, 'email': committer_email},
+            'date': date,
+            'message': message.strip(),
+            'parents': parents.split(),
+            'files': []
+        }
+    
+    @classmethod
+    def _unquote_path(cls, quoted: bytes) -> bytes:
+        """Decode the leading C-quoted path of `quoted`, stopping at its closing quote"""
+        path = bytearray()
+        i = 1
+        while i < len(quoted) and quoted[i] != ord('"'):
+            char = quoted[i]
+            if char == ord('\\') and i + 1 < len(quoted):
+                escaped = quoted[i + 1]
+                if ord('0') <= escaped <= ord('7'):
+                    # Octal byte, e.g. non-ASCII names without core.quotepath=false
+                    path.append(int(quoted[i + 1:i + 4], 8))
+                    i += 4
+                else:
+                    path.append(cls._PATH_ESCAPES.get(escaped, escaped))
+                    i += 2
+                continue
+            path.append(char)
+            i += 1
+        return bytes(path)
+    
+    @classmethod
+    def _log_path(cls, raw: bytes) -> str:
+        """Decode a path from a patch header, unquoting it if git C-quoted it"""
+        if raw.startswith(b'"'):
+            raw = cls._unquote_path(raw)
+        return raw.decode('utf-8', errors='replace')
+    
+    @classmethod
+    def _new_log_file(cls, line: bytes) -> Dict:
+        """Start a file record from a `diff --git a/<path> b/<path>` line"""
+        paths = line[11:].rstrip(b'\n')
+        # Both paths are identical unless renamed; rename lines override them
+        if paths.startswith(b'"'):
+            path = cls._unquote_path(paths)[2:].decode('utf-8', errors='replace')
+        else:
+            path = paths[2:(len(paths) - 1) // 2].decode('utf-8', errors='replace')
+        return {
+            'old_path': path,
+            'new_path': path,
+            'new_file': False,
+            'deleted': False,
+            'insertions': 0,
+            'deletions': 0,
+            'size': 0,
+            'body': []
+        }
+    
     def extract_commits(self) -> List[Dict]:
         """Extract commits with diffs"""
         self.logger.info("Extracting commits with diffs...")
@@ -213,95 +404,99 @@ class GitExtractor:
         commits_summary = []
         
         try:
-            count = 0
-            for commit in self.repo.iter_commits():
-                if self.max_commits and count >= self.max_commits:
-                    break
-                
-                try:
-                    # Get diffs
-                    diffs = []
-                    if commit.parents:
-                        parent = commit.parents[0]
-                        for diff in parent.diff(commit, create_patch=True):
-                            diff_data = {
-                                'change_type': diff.change_type,
-                                'old_path': diff.a_path,
-                                'new_path': diff.b_path,
-                                'renamed': diff.renamed,
-                                'deleted': diff.deleted_file,
-                                'new_file': diff.new_file
+            detailed_path = self.output_dir / "commits_detailed.json"
+            with open(detailed_path, 'wb') as detailed:
+                detailed.write(b'[')
+                count = 0
+                for commit in self._iter_log_commits():
+                    try:
+                        # Get diffs
+                        diffs = []
+                        if commit['parents']:
+                            for file in commit['files']:
+                                renamed = file['old_path'] != file['new_path']
+                                diff_data = {
+                                    'change_type': 'A' if file['new_file'] else 'D' if file['deleted'] else 'R' if renamed else 'M',
+                                    'old_path': file['old_path'],
+                                    'new_path': file['new_path'],
+                                    'renamed': renamed,
+                                    'deleted': file['deleted'],
+                                    'new_file': file['new_file']
+                                }
+                                
+                                # Add diff content (limit size)
+                                if file['body']:
+                                    # Truncate the raw bytes, then decode only what is kept
+                                    truncated = file['size'] > self._MAX_DIFF_BYTES
+                                    body = b''.join(file['body'])[:self._MAX_DIFF_BYTES]
+                                    diff_data['diff'] = body.decode('utf-8', errors='ignore') + ("\n... [truncated]" if truncated else "")
+                                    diff_data['truncated'] = truncated
+                                
+                                diffs.append(diff_data)
+                        
+                        # Get changed files, accumulating commit totals in the same pass
+                        changed_files = []
+                        total_insertions = 0
+                        total_deletions = 0
+                        for file in commit['files']:
+                            changed_files.append({
+                                'file': file['old_path'] if file['deleted'] else file['new_path'],
+                                'insertions': file['insertions'],
+                                'deletions': file['deletions'],
+                                'lines': file['insertions'] + file['deletions']
+                            })
+                            total_insertions += file['insertions']
+                            total_deletions += file['deletions']
+                        
+                        # Build commit data
+                        commit_data = {
+                            'sha': commit['sha'],
+                            'sha_short': commit['sha'][:7],
+                            'author': commit['author'],
+                            'committer': commit['committer'],
+                            'date': commit['date'],
+                            'message': commit['message'],
+                            'parents': commit['parents'],
+                            'changed_files': changed_files,
+                            'diffs': diffs,
+                            'stats': {
+                                'total_files': len(changed_files),
+                                'total_insertions': total_insertions,
+                                'total_deletions': total_deletions,
+                                'total_lines': total_insertions + total_deletions
                             }
-                            
-                            # Add diff content (limit size)
-                            if diff.diff:
-                                diff_text = diff.diff.decode('utf-8', errors='ignore')
-                                if len(diff_text) > 10000:
-                                    diff_data['diff'] = diff_text[:10000] + "\n... [truncated]"
-                                    diff_data['truncated'] = True
-                                else:
-                                    diff_data['diff'] = diff_text
-                                    diff_data['truncated'] = False
-                            
-                            diffs.append(diff_data)
-                    
-                    # Get changed files
-                    changed_files = []
-                    for file, stats in commit.stats.files.items():
-                        changed_files.append({
-                            'file': file,
-                            'insertions': stats['insertions'],
-                            'deletions': stats['deletions'],
-                            'lines': stats['lines']
-                        })
-                    
-                    # Build commit data
-                    commit_data = {
-                        'sha': commit.hexsha,
-                        'sha_short': commit.hexsha[:7],
-                        'author': {
-                            'name': commit.author.name,
-                            'email': commit.author.email
-                        },
-                        'committer': {
-                            'name': commit.committer.name,
-                            'email': commit.committer.email
-                        },
-                        'date': commit.committed_datetime.isoformat(),
-                        'message': commit.message.strip(),
-                        'parents': [p.hexsha for p in commit.parents],
-                        'changed_files': changed_files,
-                        'diffs': diffs,
-                        'stats': {
-                            'total_files': len(changed_files),
-                            'total_insertions': commit.stats.total['insertions'],
-                            'total_deletions': commit.stats.total['deletions'],
-                            'total_lines': commit.stats.total['lines']
                         }
-                    }
-                    
-                    commits_data.append(commit_data)
-                    
-                    # Summary for CSV
-                    commits_summary.append({
-                        'sha': commit.hexsha[:7],
-                        'author': commit.author.name,
-                        'date': commit.committed_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                        'message': commit.message.strip().split('\n')[0][:100],
-                        'files_changed': len(changed_files),
-                        'insertions': commit.stats.total['insertions'],
-                        'deletions': commit.stats.total['deletions']
-                    })
+                        
+                        # Stream the full record to disk; diffs are not kept in memory
+                        if commits_data:
+                            detailed.write(b',')
+                        detailed.write(b'\n' + orjson.dumps(commit_data, default=str, option=orjson.OPT_INDENT_2))
+                        del commit_data['diffs']
+                        commits_data.append(commit_data)
+                        
+                        # Summary for CSV
+                        commits_summary.append({
+                            'sha': commit['sha'][:7],
+                            'author': commit['author']['name'],
+                            'date': commit['date'][:19].replace('T', ' '),
+                            'message': self._subject(commit['message']),
+                            'files_changed': len(changed_files),
+                            'insertions': total_insertions,
+                            'deletions': total_deletions
+                        })
+                        
+                        count += 1
+                        if count % 50 == 0:
+                            self.logger.info(f"Processed {count} commits...")
                     
-                    count += 1
-                    if count % 50 == 0:
-                        self.logger.info(f"Processed {count} commits...")
+                    except Exception as e:
+                        self.logger.warning(f"Error processing commit: {e}")
+                        continue
                 
-                except Exception as e:
-                    self.logger.warning(f"Error processing commit: {e}")
-                    continue
+                detailed.write(b'\n]\n')
             
-            self._save_json(commits_data, "commits_detailed.json")
+            size = detailed_path.stat().st_size
+            self.logger.info(f"✓ Saved commits_detailed.json ({size:,} bytes)")
             self._save_csv(commits_summary, "commits_summary.csv")
             
             self.stats['commits_processed'] = len(commits_data)
@@ -324,7 +519,7 @@ class GitExtractor:
                     'name': branch.name,
                     'type': 'local',
                     'commit_sha': branch.commit.hexsha[:7],
-                    'commit_message': branch.commit.message.strip().split('\n')[0],
+                    'commit_message': self._subject(branch.commit.message, None),
                     'commit_date': branch.commit.committed_datetime.isoformat()
                 })
             
@@ -335,7 +530,7 @@ class GitExtractor:
                         'name': ref.name,
                         'type': 'remote',
                         'commit_sha': ref.commit.hexsha[:7],
-                        'commit_message': ref.commit.message.strip().split('\n')[0],
+                        'commit_message': self._subject(ref.commit.message, None),
                         'commit_date': ref.commit.committed_datetime.isoformat()
                     })
             
@@ -375,11 +570,14 @@ class GitExtractor:
             self.logger.error(f"Failed to extract tags: {e}")
             return []
     
-    def extract_contributors(self, commits_data: List[Dict]) -> List[Dict]:
-        """Extract contributor statistics"""
-        self.logger.info("Extracting contributors...")
+    def extract_aggregates(self, commits_data: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """Extract contributor statistics and file change history in one pass"""
+        self.logger.info("Extracting contributors and file history...")
         
         contributors_map = {}
+        file_history = {}
+        # Contributors track small integer ids instead of hashing full paths
+        path_ids = {}
         
         try:
             for commit_info in commits_data:
@@ -402,16 +600,31 @@ class GitExtractor:
                 contrib['total_insertions'] += commit_info['stats']['total_insertions']
                 contrib['total_deletions'] += commit_info['stats']['total_deletions']
                 
-                for file in commit_info['changed_files']:
-                    contrib['files_modified'].add(file['file'])
-                
                 # Update dates
                 if commit_info['date'] < contrib['first_commit']:
                     contrib['first_commit'] = commit_info['date']
                 if commit_info['date'] > contrib['last_commit']:
                     contrib['last_commit'] = commit_info['date']
+                
+                subject = self._subject(commit_info['message'])
+                
+                for file_info in commit_info['changed_files']:
+                    file_path = file_info['file']
+                    contrib['files_modified'].add(path_ids.setdefault(file_path, len(path_ids)))
+                    
+                    if file_path not in file_history:
+                        file_history[file_path] = []
+                    
+                    file_history[file_path].append({
+                        'commit': commit_info['sha_short'],
+                        'author': commit_info['author']['name'],
+                        'date': commit_info['date'],
+                        'message': subject,
+                        'insertions': file_info['insertions'],
+                        'deletions': file_info['deletions']
+                    })
             
-            # Convert to list
+            # Convert contributors to list
             contributors = []
             for contrib in contributors_map.values():
                 contrib['files_modified'] = len(contrib['files_modified'])
@@ -422,36 +635,8 @@ class GitExtractor:
             self._save_json(contributors, "contributors.json")
             self._save_csv(contributors, "contributors.csv")
             self.logger.info(f"✓ Extracted {len(contributors)} contributors")
-            return contributors
             
-        except Exception as e:
-            self.logger.error(f"Failed to extract contributors: {e}")
-            return []
-    
-    def extract_file_history(self, commits_data: List[Dict]) -> Dict:
-        """Extract file change history"""
-        self.logger.info("Extracting file history...")
-        
-        file_history = {}
-        
-        try:
-            for commit in commits_data:
-                for file_info in commit['changed_files']:
-                    file_path = file_info['file']
-                    
-                    if file_path not in file_history:
-                        file_history[file_path] = []
-                    
-                    file_history[file_path].append({
-                        'commit': commit['sha_short'],
-                        'author': commit['author']['name'],
-                        'date': commit['date'],
-                        'message': commit['message'].split('\n')[0][:100],
-                        'insertions': file_info['insertions'],
-                        'deletions': file_info['deletions']
-                    })
-            
-            # Create summary
+            # Create file summary
             file_summary = []
             for file_path, changes in file_history.items():
                 file_summary.append({
@@ -469,11 +654,11 @@ class GitExtractor:
             
             self.stats['files_tracked'] = len(file_history)
             self.logger.info(f"✓ Tracked {len(file_history)} files")
-            return file_history
+            return contributors, file_history
             
         except Exception as e:
-            self.logger.error(f"Failed to extract file history: {e}")
-            return {}
+            self.logger.error(f"Failed to extract contributors and file history: {e}")
+            return [], {}
     
     def extract_all(self) -> bool:
         """Extract all data"""
@@ -492,8 +677,7 @@ class GitExtractor:
         commits = self.extract_commits()
         self.extract_branches()
         self.extract_tags()
-        self.extract_contributors(commits)
-        self.extract_file_history(commits)
+        self.extract_aggregates(commits)
         
         # Calculate duration
         duration = (datetime.now() - start).total_seconds()
@@ -1,16 +1,106 @@
 import streamlit as st
+import pandas as pd
 import os
-import json
+import asyncio
+import orjson
+import hashlib
+import time
 import glob
+import re
+from lxml import etree
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from openai import AsyncAzureOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 # Load environment variables
 load_dotenv()
 
+# ─── Analysis Cache ───
+# Streamed output cannot be produced inside st.cache_data, so analyses are
+# content-addressed files, as in app.py
+_ANALYSIS_CACHE_DIR = Path(__file__).parent / ".llm_cache" / "streamlit"
+_ANALYSIS_CACHE_TTL = 3600
+_ANALYSIS_CACHE_MAX_ENTRIES = 64
+
+# ─── Report Extraction ───
+_WHITESPACE = re.compile(r'\s+')
+_NOISE_TAGS = {'script', 'style', 'svg'}
+_READ_CHUNK = 64 * 1024
+_MAX_RECORDS = 200
+_MAX_RECORD_CHARS = 2000
+_MAX_FALLBACK_CHARS = 20000
+
+
+class _FailureCollector:
+    """
+    lxml parser target that collects failures while a report streams in
+    
+    Only the outermost element of each kind is recorded (nested matches are
+    part of its text), and no tree is built, so memory stays O(records).
+    """
+    
+    def __init__(self):
+        self.stack = []
+        self.noise_depth = 0
+        self.active = {'failed_tests': None, 'error_messages': None, 'stack_traces': None}
+        self.records = {kind: {} for kind in self.active}
+        self.fallback = []
+        self.fallback_len = 0
+    
+    @staticmethod
+    def _kinds(tag, cls):
+        kinds = []
+        if 'fail' in cls:
+            kinds.append('failed_tests')
+        if 'error' in cls or 'exception' in cls:
+            kinds.append('error_messages')
+        if tag in ('pre', 'textarea') or 'stack' in cls:
+            kinds.append('stack_traces')
+        return kinds
+    
+    def start(self, tag, attrib):
+        self.data(' ')  # keep text of adjacent elements apart
+        opened = [k for k in self._kinds(tag, attrib.get('class', '')) if self.active[k] is None]
+        for kind in opened:
+            self.active[kind] = [[], 0]
+        noise = tag in _NOISE_TAGS
+        self.noise_depth += noise
+        self.stack.append((opened, noise))
+    
+    def data(self, text):
+        if self.noise_depth:
+            return
+        for buf in self.active.values():
+            if buf is not None and buf[1] < _MAX_RECORD_CHARS:
+                buf[0].append(text)
+                buf[1] += len(text)
+        if self.fallback_len < _MAX_FALLBACK_CHARS:
+            self.fallback.append(text)
+            self.fallback_len += len(text)
+    
+    def end(self, tag):
+        self.data(' ')
+        opened, noise = self.stack.pop()
+        self.noise_depth -= noise
+        for kind in opened:
+            text = _WHITESPACE.sub(' ', ''.join(self.active[kind][0])).strip()
+            self.active[kind] = None
+            if text and len(self.records[kind]) < _MAX_RECORDS:
+                self.records[kind].setdefault(text[:_MAX_RECORD_CHARS], None)
+    
+    def close(self):
+        extracted = {kind: list(texts) for kind, texts in self.records.items()}
+        # Unknown report layout: fall back to the page text so nothing is silently lost
+        if not any(extracted.values()):
+            extracted['text'] = _WHITESPACE.sub(' ', ''.join(self.fallback)).strip()[:_MAX_FALLBACK_CHARS]
+        return extracted
+
+
 # ─── Page Configuration ───
 st.set_page_config(
     page_title="Testing Engine",
@@ -20,175 +110,258 @@ st.set_page_config(
 )
 
 # ─── Custom CSS ───
-st.markdown("""
-<style>
-    /* Main title */
-    .main-title {
-        font-size: 2.2rem;
-        font-weight: 700;
-        color: #e2e8f0;
-        margin-bottom: 0.2rem;
-    }
-    .sub-title {
-        font-size: 1rem;
-        color: #94a3b8;
-        margin-bottom: 1.5rem;
-    }
-    
-    /* Metric cards */
-    .metric-card {
-        background: rgba(255, 255, 255, 0.05);
-        border: 1px solid rgba(255, 255, 255, 0.12);
-        border-radius: 12px;
-        padding: 1.2rem;
-        text-align: center;
-    }
-    .metric-value {
-        font-size: 2rem;
-        font-weight: 700;
-        color: #e2e8f0;
-    }
-    .metric-label {
-        font-size: 0.85rem;
-        color: #94a3b8;
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-    }
-    
-    /* Status badges */
-    .badge-pass {
-        background-color: #dcfce7;
-        color: #166534;
-        padding: 0.25rem 0.75rem;
-        border-radius: 9999px;
-        font-size: 0.8rem;
-        font-weight: 600;
-    }
-    .badge-fail {
-        background-color: #fee2e2;
-        color: #991b1b;
-        padding: 0.25rem 0.75rem;
-        border-radius: 9999px;
-        font-size: 0.8rem;
-        font-weight: 600;
-    }
-    
-    /* Commit table */
-    .commit-hash {
-        font-family: monospace;
-        background: rgba(255, 255, 255, 0.08);
-        padding: 0.15rem 0.5rem;
-        border-radius: 4px;
-        font-size: 0.85rem;
-        color: #818cf8;
-    }
-    
-    /* Analysis box */
-    .analysis-box {
-        background: rgba(255, 255, 255, 0.03);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 12px;
-        padding: 1.5rem;
-        line-height: 1.7;
-    }
-    
-    /* Sidebar styling - dark theme friendly */
-    [data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #1e1e2e 0%, #181825 100%);
-    }
-    [data-testid="stSidebar"] .stMarkdown h2,
-    [data-testid="stSidebar"] .stMarkdown h3 {
-        color: #cdd6f4 !important;
-    }
-    [data-testid="stSidebar"] .stMarkdown p,
-    [data-testid="stSidebar"] .stMarkdown span,
-    [data-testid="stSidebar"] label {
-        color: #bac2de !important;
-    }
-    
-    /* Hide default Streamlit elements */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Divider */
-    .section-divider {
-        border-top: 2px solid rgba(255, 255, 255, 0.1);
-        margin: 1.5rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def load_css():
+    """Stylesheet text, read from disk once per server process"""
+    return (Path(__file__).parent / "static" / "styles.css").read_text(encoding='utf-8')
+
+
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 
 # ─── Helper Functions ───
-@st.cache_data
+def _stat_key(path):
+    """(mtime, size) of a file for use in cache keys, or None if it does not exist"""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@st.cache_data(show_spinner=False)
+def _load_json(path, stat_key, default):
+    """Parse a JSON file; stat_key only invalidates the cache when the file changes"""
+    if stat_key is None:
+        return default
+    return orjson.loads(Path(path).read_bytes())
+
+
 def load_commit_data(data_folder):
     """Load commit history from JSON file"""
     commits_file = Path(data_folder) / "commits_detailed.json"
-    if commits_file.exists():
-        with open(commits_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    return _load_json(str(commits_file), _stat_key(commits_file), [])
 
 
-@st.cache_data
 def load_repo_info(data_folder):
     """Load repository metadata"""
     info_file = Path(data_folder) / "repository_info.json"
-    if info_file.exists():
-        with open(info_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    return _load_json(str(info_file), _stat_key(info_file), {})
 
 
-@st.cache_data
 def load_contributors(data_folder):
     """Load contributor data"""
     contributors_file = Path(data_folder) / "contributors.json"
-    if contributors_file.exists():
-        with open(contributors_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    return _load_json(str(contributors_file), _stat_key(contributors_file), [])
+
+
+@st.cache_data(show_spinner=False)
+def _commits_df(path, stat_key):
+    """One row per commit with the columns used for metrics and search"""
+    rows = []
+    for commit in _load_json(path, stat_key, []):
+        message = commit.get('message', '')
+        stats = commit.get('stats', {})
+        rows.append({
+            'sha': commit.get('sha', commit.get('hash', ''))[:8],
+            'author': commit.get('author', {}).get('name', ''),
+            'date': commit.get('date', '')[:19],
+            'subject': message.partition('\n')[0],
+            'files': len(commit.get('changed_files', commit.get('files_changed', []))),
+            'insertions': stats.get('total_insertions', 0),
+            'deletions': stats.get('total_deletions', 0),
+            'message': message
+        })
+    df = pd.DataFrame(
+        rows, columns=['sha', 'author', 'date', 'subject', 'files', 'insertions', 'deletions', 'message']
+    )
+    # Lowercased once per dataset so each search keystroke is a single scan
+    df['search_blob'] = (df['sha'] + '\n' + df['author'] + '\n' + df['message']).str.lower()
+    return df
+
+
+def load_commits_df(data_folder):
+    """Commit table for vectorized metrics and search, aligned with load_commit_data"""
+    commits_file = Path(data_folder) / "commits_detailed.json"
+    return _commits_df(str(commits_file), _stat_key(commits_file))
+
+
+@st.cache_data(show_spinner=False, hash_funcs={Path: lambda p: (str(p), p.stat().st_mtime)})
+def extract_failures(path):
+    """Stream-parse an HTML report, keeping only failing tests, error messages and stack traces"""
+    collector = _FailureCollector()
+    parser = etree.HTMLParser(target=collector, encoding='utf-8', remove_comments=True)
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_READ_CHUNK), b''):
+                parser.feed(chunk)
+        return parser.close()
+    except etree.LxmlError:
+        # Empty or unparseable report: keep whatever was collected (an empty record set for empty files)
+        return collector.close()
+
+
+def _read_report(report_file):
+    """Hash one HTML report and extract its failures; the HTML itself is not kept"""
+    path = Path(report_file)
+    try:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_READ_CHUNK), b''):
+                sha1.update(chunk)
+        return {
+            'name': path.name,
+            'size_kb': round(path.stat().st_size / 1024, 2),
+            'path': str(path),
+            'sha1': sha1.hexdigest(),
+            'failures': extract_failures(path)
+        }
+    except Exception as e:
+        # One bad report must not stop the others (or the page) from loading
+        return {
+            'name': path.name,
+            'size_kb': 0,
+            'path': str(path),
+            'sha1': '',
+            'failures': _FailureCollector().close(),
+            'error': str(e)
+        }
+
+
+@st.cache_data(show_spinner=False)
+def _load_html_reports(report_files, stat_keys):
+    """Read the given reports in parallel; stat_keys only invalidates the cache when a file changes"""
+    if not report_files:
+        return []
+    with ThreadPoolExecutor(max_workers=min(8, len(report_files))) as executor:
+        return list(executor.map(_read_report, report_files))
 
 
 def load_html_reports(reports_folder):
     """Load all HTML test reports"""
     html_reports_path = Path(reports_folder) / "html-reports"
-    reports = []
-    if html_reports_path.exists():
-        report_files = sorted(glob.glob(str(html_reports_path / "*.html")))
-        for report_file in report_files:
-            path = Path(report_file)
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            reports.append({
-                'name': path.name,
-                'size_kb': round(len(content) / 1024, 2),
-                'content': content
-            })
-    return reports
+    if not html_reports_path.exists():
+        return []
+    report_files = sorted(glob.glob(str(html_reports_path / "*.html")))
+    return _load_html_reports(report_files, [_stat_key(f) for f in report_files])
 
 
+@st.cache_data(ttl=30)
 def get_data_folders():
-    """Scan pulled_data directory for available datasets"""
+    """Scan pulled_data directory for available datasets, skipping hidden folders"""
     base_path = Path(__file__).parent / "pulled_data"
     if base_path.exists():
-        return [f.name for f in base_path.iterdir() if f.is_dir()]
+        return sorted(f.name for f in base_path.iterdir() if f.is_dir() and not f.name.startswith('.'))
     return []
 
 
-def run_llm_analysis(commits_data, test_reports, max_commits=30):
-    """Run Azure OpenAI analysis"""
-    llm = AzureChatOpenAI(
-        deployment_name="gpt-4.1-mini",
-        model_name="gpt-4.1-mini",
-        temperature=0.1,
-        max_tokens=1500,
+@st.cache_resource
+def get_llm(deployment="gpt-4.1-mini", temperature=0.1, max_tokens=1500):
+    """Azure OpenAI client, shared across reruns for each settings combination"""
+    return AzureChatOpenAI(
+        deployment_name=deployment,
+        model_name=deployment,
+        temperature=temperature,
+        max_tokens=max_tokens,
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_version=os.getenv("AZURE_OPENAI_VERSION"),
         api_key=os.getenv("OPENAI_API_KEY"),
-        azure_deployment="gpt-4.1-mini"
+        azure_deployment=deployment
     )
+
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(3),
+    reraise=True
+)
+async def _complete(client, messages, max_tokens, temperature, deployment="gpt-4.1-mini"):
+    """Single chat completion, retried on transient Azure errors"""
+    response = await client.chat.completions.create(
+        model=deployment,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature
+    )
+    return response.choices[0].message.content
+
+
+async def analyze_one(client, semaphore, report, max_tokens, temperature):
+    """Map step: extract the failures from one test report"""
+    messages = [
+        {'role': 'system', 'content': "You are an expert QA engineer extracting test failures from test reports."},
+        {'role': 'user', 'content': f"""Extract every failing test from the following test report ({report['name']}).
+
+For each failure list: test name, exact error message, file/line references from the stack trace, and duration if shown. If all tests passed, say so. Be concise; do not speculate about causes.
+
+EXTRACTED REPORT DATA:
+{orjson.dumps(report['failures']).decode('utf-8')}"""}
+    ]
+    async with semaphore:
+        return await _complete(client, messages, max_tokens, temperature)
+
+
+async def analyze_reports(test_reports, max_tokens, temperature, max_concurrency=10):
+    """Fan out one request per report, capped to Azure's concurrency limit"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with AsyncAzureOpenAI(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_version=os.getenv("AZURE_OPENAI_VERSION"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0  # retries are handled by _complete
+    ) as client:
+        return await asyncio.gather(
+            *(analyze_one(client, semaphore, report, max_tokens, temperature) for report in test_reports)
+        )
+
+
+def analysis_cache_key(commits_data, test_reports, max_commits, max_tokens, temperature):
+    """Content hash of everything that determines an analysis"""
+    key = hashlib.blake2b(digest_size=32)
+    key.update(orjson.dumps(commits_data[:max_commits]))
+    key.update(orjson.dumps([[r['name'], r['sha1']] for r in test_reports]))
+    key.update(orjson.dumps([max_commits, max_tokens, temperature]))
+    return key.hexdigest()
+
+
+def load_cached_analysis(cache_key):
+    """Previously stored analysis for these inputs, or None if missing or expired"""
+    cache_file = _ANALYSIS_CACHE_DIR / f"{cache_key}.txt"
+    try:
+        if time.time() - cache_file.stat().st_mtime > _ANALYSIS_CACHE_TTL:
+            return None
+        return cache_file.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def store_cached_analysis(cache_key, analysis):
+    """Store an analysis on disk, keeping only the newest entries"""
+    _ANALYSIS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_file = _ANALYSIS_CACHE_DIR / f"{cache_key}.txt"
+    tmp_file = cache_file.with_suffix(".tmp")
+    tmp_file.write_text(analysis, encoding='utf-8')
+    os.replace(tmp_file, cache_file)
+    
+    entries = sorted(_ANALYSIS_CACHE_DIR.glob("*.txt"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[_ANALYSIS_CACHE_MAX_ENTRIES:]:
+        stale.unlink(missing_ok=True)
+
+
+def group_identical_reports(test_reports):
+    """Group reports whose extracted failures are identical, so each is analysed once"""
+    groups = {}
+    for report in test_reports:
+        groups.setdefault(orjson.dumps(report['failures'], option=orjson.OPT_SORT_KEYS), []).append(report)
+    return list(groups.values())
+
+
+def run_llm_analysis(commits_data, test_reports, max_commits=30, max_tokens=1500, temperature=0.1, placeholder=None):
+    """Run Azure OpenAI analysis: per-report findings in parallel, then one synthesis call"""
+    groups = group_identical_reports(test_reports)
+    findings = asyncio.run(analyze_reports([group[0] for group in groups], max_tokens, temperature))
+    llm = get_llm(temperature=temperature, max_tokens=max_tokens)
     
     # Prepare commit context
     commit_summary = []
@@ -201,18 +374,23 @@ def run_llm_analysis(commits_data, test_reports, max_commits=30):
             'files_changed': len(commit.get('files_changed', commit.get('changed_files', [])))
         })
     
-    # Prepare reports
-    reports_text = ""
-    for idx, report in enumerate(test_reports, 1):
-        reports_text += f"\n\n--- TEST REPORT {idx}: {report['name']} ({report['size_kb']} KB) ---\n"
-        reports_text += report['content']
+    # Prepare per-report findings, once per group of identical reports
+    parts = []
+    for idx, (group, report_findings) in enumerate(zip(groups, findings), 1):
+        names = ", ".join(report['name'] for report in group)
+        if len(group) > 1:
+            parts.append(f"\n\n--- TEST REPORT {idx}: {names} ({len(group)} reports with identical failures) ---\n")
+        else:
+            parts.append(f"\n\n--- TEST REPORT {idx}: {names} ({group[0]['size_kb']} KB) ---\n")
+        parts.append(report_findings or "")
+    reports_text = "".join(parts)
     
-    prompt = f"""You are a QA test analysis expert. Analyze the following commit history and HTML test execution reports to identify root causes of test failures.
+    prompt = f"""You are a QA test analysis expert. Analyze the following commit history and test failures extracted from HTML test execution reports to identify root causes of test failures.
 
 COMMIT HISTORY (Last {max_commits} commits):
-{json.dumps(commit_summary, indent=2)}
+{orjson.dumps(commit_summary, option=orjson.OPT_INDENT_2).decode('utf-8')}
 
-TEST EXECUTION REPORTS (Raw HTML):
+TEST FAILURES BY REPORT:
 {reports_text}
 
 Provide your analysis in EXACTLY the following format with these markdown headings. Under each heading, write clear bullet points:
@@ -242,8 +420,16 @@ IMPORTANT: Use the exact heading format above (## emoji Title). Under each headi
         HumanMessage(content=prompt)
     ]
     
-    response = llm.invoke(messages)
-    return response.content
+    if placeholder is None:
+        return llm.invoke(messages).content
+    
+    # Stream the synthesis so output appears from the first token
+    analysis = ""
+    for chunk in llm.stream(messages):
+        analysis += chunk.content
+        placeholder.markdown(analysis + "▌")
+    placeholder.empty()
+    return analysis
 
 
 def save_analysis(analysis_result, commits_data, test_reports, output_file="llm_analysis.json"):
@@ -253,42 +439,45 @@ def save_analysis(analysis_result, commits_data, test_reports, output_file="llm_
         'commits_analyzed': len(commits_data),
         'reports_analyzed': len(test_reports),
         'llm_analysis': analysis_result,
+        # References only; the commits and reports stay in pulled_data and html-reports
         'raw_data': {
-            'commits': commits_data[:30],
-            'test_reports': test_reports
+            'commit_shas': [c.get('sha', c.get('hash', '')) for c in commits_data[:30]],
+            'test_reports': [
+                {'name': r['name'], 'path': r['path'], 'sha1': r['sha1']}
+                for r in test_reports
+            ]
         }
     }
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2)
+    Path(output_file).write_bytes(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
 
 
 def load_previous_analysis(output_file="llm_analysis.json"):
     """Load previously saved analysis"""
     path = Path(__file__).parent / output_file
     if path.exists():
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return orjson.loads(path.read_bytes())
     return None
 
 
-def render_formatted_analysis(analysis_text):
-    """Render analysis text as styled section cards with headings and bullet points"""
-    import re
-    
-    # Split by ## headings
-    sections = re.split(r'(?=^## )', analysis_text.strip(), flags=re.MULTILINE)
+# Analysis sections start at "## " headings; border color comes from the heading emoji
+_SECTION_SPLIT = re.compile(r'(?=^## )', re.MULTILINE)
+_SECTION_COLORS = {
+    '🔴': '#ef4444',
+    '🔗': '#8b5cf6',
+    '📍': '#f59e0b',
+    '💡': '#22c55e',
+    '📊': '#3b82f6',
+    '✅': '#10b981',
+}
+
+
+@st.cache_data
+def _parse_sections(analysis_text):
+    """Split analysis text into (heading, border_color, body) tuples at its ## headings"""
+    sections = _SECTION_SPLIT.split(analysis_text.strip())
     sections = [s.strip() for s in sections if s.strip()]
     
-    # Color map for section icons
-    section_colors = {
-        '🔴': '#ef4444',
-        '🔗': '#8b5cf6',
-        '📍': '#f59e0b',
-        '💡': '#22c55e',
-        '📊': '#3b82f6',
-        '✅': '#10b981',
-    }
-    
+    parsed = []
     for section in sections:
         lines = section.split('\n')
         heading = lines[0].lstrip('#').strip() if lines else ''
@@ -296,11 +485,18 @@ def render_formatted_analysis(analysis_text):
         
         # Detect color from emoji in heading
         border_color = '#6366f1'  # default purple
-        for emoji, color in section_colors.items():
+        for emoji, color in _SECTION_COLORS.items():
             if emoji in heading:
                 border_color = color
                 break
         
+        parsed.append((heading, border_color, body))
+    return parsed
+
+
+def render_formatted_analysis(analysis_text):
+    """Render analysis text as styled section cards with headings and bullet points"""
+    for heading, border_color, body in _parse_sections(analysis_text):
         st.markdown(
             f"""
             <div style="
@@ -341,14 +537,6 @@ with st.sidebar:
     
     st.markdown("---")
     
-    # LLM Settings
-    st.markdown("### 🤖 LLM Settings")
-    max_commits = st.slider("Commits to Analyze", min_value=5, max_value=50, value=30, step=5)
-    max_tokens = st.slider("Max Tokens", min_value=500, max_value=3000, value=1500, step=100)
-    temperature = st.slider("Temperature", min_value=0.0, max_value=1.0, value=0.1, step=0.05)
-    
-    st.markdown("---")
-    
     # Azure OpenAI status
     st.markdown("### 🔑 Azure OpenAI")
     api_key = os.getenv("OPENAI_API_KEY", "")
@@ -377,50 +565,25 @@ st.markdown('<p class="sub-title">AI-Powered Test Failure Analysis — Commits 
 # Load data
 base_dir = Path(__file__).parent
 commits_data = load_commit_data(str(data_path))
+commits_df = load_commits_df(str(data_path))
 repo_info = load_repo_info(str(data_path))
 contributors = load_contributors(str(data_path))
 test_reports = load_html_reports(str(base_dir))
 
 # ─── Top Metrics ───
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-value">{len(commits_data)}</div>
-        <div class="metric-label">Commits</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    st.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-value">{len(test_reports)}</div>
-        <div class="metric-label">Test Reports</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col3:
-    total_size = sum(r['size_kb'] for r in test_reports)
-    st.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-value">{total_size:.1f}</div>
-        <div class="metric-label">Report Size (KB)</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col4:
-    unique_authors = set()
-    for c in commits_data:
-        author = c.get('author', {}).get('name', '')
-        if author:
-            unique_authors.add(author)
-    st.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-value">{len(unique_authors)}</div>
-        <div class="metric-label">Contributors</div>
-    </div>
-    """, unsafe_allow_html=True)
+total_size = sum(r['size_kb'] for r in test_reports)
+unique_authors = commits_df.loc[commits_df['author'] != '', 'author'].nunique()
+metrics = [
+    (len(commits_data), "Commits"),
+    (len(test_reports), "Test Reports"),
+    (f"{total_size:.1f}", "Report Size (KB)"),
+    (unique_authors, "Contributors"),
+]
+cards = "".join(
+    f'<div class="metric-card"><div class="metric-value">{value}</div><div class="metric-label">{label}</div></div>'
+    for value, label in metrics
+)
+st.markdown(f'<div class="metric-row">{cards}</div>', unsafe_allow_html=True)
 
 st.markdown("")
 
@@ -430,14 +593,26 @@ tab_analysis, tab_commits, tab_reports, tab_history = st.tabs([
 ])
 
 # ─── Tab 1: AI Analysis ───
-with tab_analysis:
+@st.fragment
+def analysis_panel(commits_data, test_reports):
+    """LLM settings, run button and results; reruns alone when its widgets change"""
     st.markdown("### Run AI Analysis")
     st.markdown("Send commit history and test reports to Azure OpenAI for intelligent root cause analysis.")
     
+    # LLM Settings
+    col_commits, col_tokens, col_temp = st.columns(3)
+    with col_commits:
+        max_commits = st.slider("Commits to Analyze", min_value=5, max_value=50, value=30, step=5)
+    with col_tokens:
+        max_tokens = st.slider("Max Tokens", min_value=500, max_value=3000, value=1500, step=100)
+    with col_temp:
+        temperature = st.slider("Temperature", min_value=0.0, max_value=1.0, value=0.1, step=0.05)
+    
     col_btn, col_status = st.columns([1, 3])
     
     with col_btn:
         run_analysis = st.button("🚀 Analyze Now", type="primary", use_container_width=True)
+        force_refresh = st.checkbox("Force refresh", help="Ignore the cached analysis for these inputs")
     
     with col_status:
         if not (api_key and endpoint):
@@ -455,13 +630,25 @@ with tab_analysis:
         elif len(test_reports) == 0:
             st.error("❌ No test reports found. Place HTML files in html-reports/ folder.")
         else:
+            stream_area = st.empty()
             with st.spinner("🔄 Analyzing with Azure OpenAI GPT-4..."):
                 try:
-                    analysis = run_llm_analysis(commits_data, test_reports, max_commits)
+                    cache_key = analysis_cache_key(commits_data, test_reports, max_commits, max_tokens, temperature)
+                    analysis = None if force_refresh else load_cached_analysis(cache_key)
+                    cached = analysis is not None
+                    if not cached:
+                        analysis = run_llm_analysis(
+                            commits_data, test_reports, max_commits, max_tokens, temperature,
+                            placeholder=stream_area
+                        )
+                        store_cached_analysis(cache_key, analysis)
                     save_analysis(analysis, commits_data, test_reports)
                     st.session_state['analysis_result'] = analysis
                     st.session_state['analysis_time'] = datetime.now().isoformat()
-                    st.success("✅ Analysis complete! Results saved to llm_analysis.json")
+                    if cached:
+                        st.success("✅ Loaded cached analysis for identical inputs (tick Force refresh to re-run)")
+                    else:
+                        st.success("✅ Analysis complete! Results saved to llm_analysis.json")
                 except Exception as e:
                     st.error(f"❌ Analysis failed: {str(e)}")
     
@@ -477,10 +664,10 @@ with tab_analysis:
         # Download button
         st.download_button(
             label="📥 Download Analysis (JSON)",
-            data=json.dumps({
+            data=orjson.dumps({
                 'timestamp': st.session_state.get('analysis_time', ''),
                 'analysis': analysis_text
-            }, indent=2),
+            }, option=orjson.OPT_INDENT_2),
             file_name=f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
             mime="application/json"
         )
@@ -502,6 +689,10 @@ with tab_analysis:
             )
 
 
+with tab_analysis:
+    analysis_panel(commits_data, test_reports)
+
+
 # ─── Tab 2: Commits ───
 with tab_commits:
     st.markdown("### Commit History")
@@ -516,8 +707,30 @@ with tab_commits:
     # Search
     search_query = st.text_input("🔍 Search commits", placeholder="Search by message, author, or hash...")
     
-    # Display commits
-    for idx, commit in enumerate(commits_data):
+    # Apply search filter
+    if search_query:
+        mask = commits_df['search_blob'].str.contains(search_query.lower(), regex=False)
+        matches = commits_df.index[mask]
+    else:
+        matches = commits_df.index
+    
+    # Commit table: one virtualized element instead of an expander per commit
+    filtered_df = commits_df.loc[matches]
+    selection = st.dataframe(
+        filtered_df,
+        use_container_width=True,
+        hide_index=True,
+        column_order=['sha', 'author', 'date', 'subject', 'files', 'insertions', 'deletions'],
+        on_select="rerun",
+        selection_mode="single-row",
+        # A new dataset or query gets a fresh widget, so a stale row selection is dropped
+        key=f"commits_table_{selected_folder}_{search_query}"
+    )
+    
+    # Details for the selected commit
+    selected_rows = selection.selection.rows
+    if selected_rows and selected_rows[0] < len(filtered_df):
+        commit = commits_data[filtered_df.index[selected_rows[0]]]
         sha = commit.get('sha', commit.get('hash', ''))[:8]
         author = commit.get('author', {}).get('name', 'Unknown')
         date = commit.get('date', '')
@@ -525,36 +738,30 @@ with tab_commits:
         changed_files = commit.get('changed_files', commit.get('files_changed', []))
         stats = commit.get('stats', {})
         
-        # Apply search filter
-        if search_query:
-            search_lower = search_query.lower()
-            if (search_lower not in message.lower() and 
-                search_lower not in author.lower() and 
-                search_lower not in sha.lower()):
-                continue
+        st.markdown(f"#### `{sha}` — {message[:80]}{'...' if len(message) > 80 else ''}")
+        col_a, col_b, col_c = st.columns([2, 2, 1])
+        with col_a:
+            st.markdown(f"**Author:** {author}")
+        with col_b:
+            st.markdown(f"**Date:** {date[:19] if date else 'N/A'}")
+        with col_c:
+            st.markdown(f"**Files:** {len(changed_files)}")
         
-        with st.expander(f"`{sha}` — {message[:80]}{'...' if len(message) > 80 else ''}", expanded=False):
-            col_a, col_b, col_c = st.columns([2, 2, 1])
-            with col_a:
-                st.markdown(f"**Author:** {author}")
-            with col_b:
-                st.markdown(f"**Date:** {date[:19] if date else 'N/A'}")
-            with col_c:
-                st.markdown(f"**Files:** {len(changed_files)}")
-            
-            # Stats
-            if stats:
-                ins = stats.get('total_insertions', 0)
-                dels = stats.get('total_deletions', 0)
-                st.markdown(f"**Lines:** <span style='color:#22c55e;'>+{ins}</span> / "
-                           f"<span style='color:#ef4444;'>-{dels}</span>", unsafe_allow_html=True)
-            
-            # Changed files
-            if changed_files:
-                st.markdown("**Changed Files:**")
-                for f in changed_files:
-                    fname = f.get('file', f) if isinstance(f, dict) else str(f)
-                    st.markdown(f"- `{fname}`")
+        # Stats
+        if stats:
+            ins = stats.get('total_insertions', 0)
+            dels = stats.get('total_deletions', 0)
+            st.markdown(f"**Lines:** <span style='color:#22c55e;'>+{ins}</span> / "
+                       f"<span style='color:#ef4444;'>-{dels}</span>", unsafe_allow_html=True)
+        
+        # Changed files
+        if changed_files:
+            st.markdown("**Changed Files:**")
+            for f in changed_files:
+                fname = f.get('file', f) if isinstance(f, dict) else str(f)
+                st.markdown(f"- `{fname}`")
+    else:
+        st.caption("Select a commit to see its details.")
 
 
 # ─── Tab 3: Test Reports ───
@@ -568,6 +775,8 @@ with tab_reports:
         for idx, report in enumerate(test_reports):
             st.markdown(f"#### 📄 {report['name']}")
             st.markdown(f"**Size:** {report['size_kb']} KB")
+            if report.get('error'):
+                st.warning(f"Could not read this report: {report['error']}")
             
             col_view, col_raw = st.columns(2)
             
@@ -579,13 +788,15 @@ with tab_reports:
                 if st.button(f"📝 View Source", key=f"raw_{idx}", use_container_width=True):
                     st.session_state[f'show_raw_{idx}'] = not st.session_state.get(f'show_raw_{idx}', False)
             
-            # Render HTML report
+            # Render HTML report (read from disk only when shown)
             if st.session_state.get(f'show_report_{idx}', False):
-                st.components.v1.html(report['content'], height=600, scrolling=True)
+                st.components.v1.html(Path(report['path']).read_text(encoding='utf-8', errors='replace'), height=600, scrolling=True)
             
             # Show raw HTML
             if st.session_state.get(f'show_raw_{idx}', False):
-                st.code(report['content'][:5000] + ("\n\n... [truncated]" if len(report['content']) > 5000 else ""), language="html")
+                with open(report['path'], 'r', encoding='utf-8', errors='replace') as f:
+                    source = f.read(5001)
+                st.code(source[:5000] + ("\n\n... [truncated]" if len(source) > 5000 else ""), language="html")
             
             st.markdown("---")
 
@@ -609,7 +820,7 @@ with tab_history:
         # Download
         st.download_button(
             label="📥 Download Full Report (JSON)",
-            data=json.dumps(prev, indent=2, default=str),
+            data=orjson.dumps(prev, default=str, option=orjson.OPT_INDENT_2),
             file_name=f"full_report_{datetime.now().strftime('%Y%m%d')}.json",
             mime="application/json"
         )
@@ -0,0 +1,63 @@
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from git_extractor import GitExtractor
+
+
+class QuotedPathTest(unittest.TestCase):
+    """Paths git C-quotes in patch headers (`"`, `\\`, tabs...) are stored unquoted"""
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.repo = self.tmp / "repo"
+        self.repo.mkdir()
+        self._git('init', '-q')
+        self._git('config', 'user.name', 'Test')
+        self._git('config', 'user.email', 'test@example.com')
+    
+    def tearDown(self):
+        extractor = getattr(self, 'extractor', None)
+        if extractor is not None:
+            for handler in extractor.logger.handlers[:]:
+                handler.close()
+                extractor.logger.removeHandler(handler)
+        self._tmp.cleanup()
+    
+    def _git(self, *args):
+        subprocess.run(['git', '-C', str(self.repo), *args], check=True, capture_output=True)
+    
+    def _commit(self, message):
+        self._git('add', '-A')
+        self._git('commit', '-q', '-m', message)
+    
+    def _extract(self):
+        self.extractor = GitExtractor("https://example.com/org/repo.git", output_dir=str(self.tmp / "out"))
+        self.extractor.clone_dir = self.repo
+        return self.extractor.extract_commits()
+    
+    def test_quoted_paths_and_renames(self):
+        (self.repo / 'weird"q.txt').write_text("one\n")
+        (self.repo / 'tab\there.txt').write_text("two\n")
+        self._commit("add files")
+        self._git('mv', 'weird"q.txt', 'back\\slash.txt')
+        (self.repo / 'tab\there.txt').write_text("two\nthree\n")
+        self._commit("rename and edit")
+        
+        commits = self._extract()
+        
+        self.assertEqual(
+            sorted(f['file'] for f in commits[1]['changed_files']), ['tab\there.txt', 'weird"q.txt']
+        )
+        latest = {f['file']: f for f in commits[0]['changed_files']}
+        self.assertEqual(sorted(latest), ['back\\slash.txt', 'tab\there.txt'])
+        self.assertEqual(latest['tab\there.txt']['insertions'], 1)
+    
+    def test_unquote_octal_and_escapes(self):
+        self.assertEqual(GitExtractor._unquote_path(b'"a/caf\\303\\251\\t\\"x\\"" "b/..."'), 'a/café\t"x"'.encode())
+
+
+if __name__ == '__main__':
+    unittest.main()